@@ -0,0 +1,35 @@
+"""store user_opinions.updated_at with time zone
+
+Revision ID: 44a98be03f47
+Revises: 6c50dea76ee0
+Create Date: 2026-10-15 04:56:22.537490
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '44a98be03f47'
+down_revision = '6c50dea76ee0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing values were written with datetime.utcnow(), i.e. naive UTC
+    with op.batch_alter_table('user_opinions', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+               existing_type=sa.DateTime(),
+               type_=sa.DateTime(timezone=True),
+               existing_nullable=True,
+               postgresql_using="updated_at AT TIME ZONE 'UTC'")
+
+
+def downgrade():
+    with op.batch_alter_table('user_opinions', schema=None) as batch_op:
+        batch_op.alter_column('updated_at',
+               existing_type=sa.DateTime(timezone=True),
+               type_=sa.DateTime(),
+               existing_nullable=True,
+               postgresql_using="updated_at AT TIME ZONE 'UTC'")
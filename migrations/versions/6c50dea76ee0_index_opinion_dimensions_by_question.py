@@ -0,0 +1,26 @@
+"""index opinion dimensions by question
+
+Revision ID: 6c50dea76ee0
+Revises: f6354121b411
+Create Date: 2026-10-15 04:55:59.740768
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c50dea76ee0'
+down_revision = 'f6354121b411'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('opinion_dimensions', schema=None) as batch_op:
+        batch_op.create_index('ix_opiniondim_type_num', ['question_type', 'question_number'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('opinion_dimensions', schema=None) as batch_op:
+        batch_op.drop_index('ix_opiniondim_type_num')
@@ -1,33 +1,64 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import exc, text
+from sqlalchemy import exc, inspect, text, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import joinedload
 from flask_login import LoginManager
 from flask_migrate import Migrate
-from dotenv import load_dotenv
+from dotenv import load_dotenv, find_dotenv
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.blocking import BlockingScheduler
+import atexit
+import bisect
 import os
-import time
-from threading import Thread
-from datetime import datetime
+import statistics
+from datetime import datetime, timedelta, timezone
+import logging
 
 # ---------------------------------
-# Global DB object + environment
+# Global DB object
 # ---------------------------------
 db = SQLAlchemy()
-load_dotenv()
+log = logging.getLogger(__name__)
 
 # Dummy email helper so old imports keep working, but nothing is sent.
 def send_email_safe(*args, **kwargs):
-    print("[MAIL DISABLED] send_email_safe() was called but email sending is turned off.")
+    log.info("[MAIL DISABLED] send_email_safe() was called but email sending is turned off.")
     return True
 
 
+# Postgres URL prefixes that get rewritten to the psycopg (v3) driver
+_PG_URL_PREFIXES = ("postgresql://", "postgresql+psycopg2://")
+
+
+def _with_psycopg_driver(db_url):
+    """Ensure the psycopg (v3) driver for Postgres URLs."""
+    for prefix in _PG_URL_PREFIXES:
+        if db_url.startswith(prefix):
+            return "postgresql+psycopg://" + db_url[len(prefix):]
+    return db_url
+
+
 # ========================================================
 # CREATE APP
 # ========================================================
 def create_app():
     # instance_relative_config=True so app.instance_path points to /instance
     app = Flask(__name__, instance_relative_config=True)
-    app.config['SECRET_KEY'] = 'hjshjhdjah kjshkjdhjs'
+
+    # Read .env here rather than at import, so importing the package has no
+    # side effects. Variables already set in the environment win.
+    load_dotenv(dotenv_path=os.getenv("ENV_FILE") or find_dotenv(), override=False)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+
+    # ---------- Session / signing config ----------
+    secret_key = os.getenv("SECRET_KEY")
+    if not secret_key or len(secret_key) < 32:
+        raise RuntimeError("SECRET_KEY must be set in .env (at least 32 characters)")
+    app.config['SECRET_KEY'] = secret_key
+    app.config['SESSION_COOKIE_SAMESITE'] = "Lax"
+    app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=7)
 
     # Ensure instance folder exists
     try:
@@ -40,14 +71,21 @@ def create_app():
     if not db_url:
         raise RuntimeError("DATABASE_URL not set in .env")
 
-    # Ensure psycopg2 driver
-    if db_url.startswith("postgresql://") and "+psycopg2" not in db_url:
-        db_url = db_url.replace("postgresql://", "postgresql+psycopg2://", 1)
+    db_url = _with_psycopg_driver(db_url)
 
     app.config['SQLALCHEMY_DATABASE_URI'] = db_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-    print("📌 USING DATABASE:", app.config['SQLALCHEMY_DATABASE_URI'])
+    # pool_pre_ping only pings when a connection is checked out of the pool,
+    # so dead connections are detected without a query on every request.
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        "pool_pre_ping": True,
+        "pool_recycle": int(os.getenv("SQLALCHEMY_POOL_RECYCLE", 3600)),
+        "pool_size": int(os.getenv("SQLALCHEMY_POOL_SIZE", 30)),
+        "max_overflow": 10,
+    }
+
+    log.info("Using database: %s", make_url(db_url).render_as_string(hide_password=True))
 
     db.init_app(app)
     Migrate(app, db)
@@ -64,8 +102,10 @@ def create_app():
     # ---------- Models + DB init ----------
     from .models import User
     with app.app_context():
-        db.create_all()
-        db.session.commit()
+        # Schema is owned by Flask-Migrate (`flask db upgrade`); create_all()
+        # is only for tests and throwaway local databases.
+        if app.config.get("TESTING") or os.getenv("AUTO_CREATE_ALL") == "1":
+            db.create_all()
         initialize_opinion_dimensions()
 
     # ---------- Login manager ----------
@@ -73,25 +113,32 @@ def create_app():
     login_manager.login_view = 'auth.login'
     login_manager.init_app(app)
 
+    # Views only show the partner's name and slots and poll their arrival,
+    # so only those columns of the partner row are fetched.
+    _PARTNER_LOAD = joinedload(User.partner).load_only(
+        User.user_name, User.time_slot_1, User.time_slot_2, User.time_slot_3, User.hasarrived
+    )
+
     @login_manager.user_loader
     def load_user(id):
-        return User.query.get(int(id))
-
-    # ---------- DB connection health ----------
-    @app.before_request
-    def before_request():
-        try:
-            db.session.execute(text("SELECT 1"))
-        except exc.SQLAlchemyError:
-            db.session.rollback()
-            db.session.remove()
-            db.engine.dispose()
-
-    @app.teardown_request
-    def teardown_request(exception=None):
-        db.session.remove()
-
-    # ---------- Start matching scheduler (no emails) ----------
+        # Session.get goes straight to the identity map / primary key lookup;
+        # the partner is joined in so views don't need a second SELECT.
+        return db.session.get(User, int(id), options=[_PARTNER_LOAD])
+
+    # ---------- DB error handling ----------
+    @app.errorhandler(exc.SQLAlchemyError)
+    def handle_db_error(error):
+        db.session.rollback()
+        return "The database is currently unavailable. Please try again.", 503
+
+    # ---------- Matching scheduler (no emails) ----------
+    # Normally runs as its own process via `flask run-scheduler`;
+    # ENABLE_SCHEDULER=1 runs it inside this process instead.
+    @app.cli.command("run-scheduler")
+    def run_scheduler_command():
+        """Run the hourly matching scheduler in the foreground."""
+        run_scheduler_blocking(app)
+
     init_scheduler(app)
 
     return app
@@ -100,92 +147,178 @@ def create_app():
 def create_database(app):
     with app.app_context():
         db.create_all()
-        print('Created Database!')
+        log.info("Created database")
 
 
 # ========================================================
 # OPINION DIMENSIONS INITIALIZATION
 # ========================================================
+# (name, display_name, question_type, question_number, description, default_weight)
+_DIMENSIONS = (
+    # A. GENERAL ATTITUDE (5)
+    ("attitude_open_to_differ", "Open to Different Opinions", "attitude", 1,
+     "I am open to hearing opinions on this topic that differ from my own.", 1.0),
+    ("attitude_see_both_sides", "See Both Positive and Negative", "attitude", 2,
+     "I can see both positive and negative aspects of this issue.", 1.0),
+    ("attitude_willing_adjust", "Willing to Adjust View", "attitude", 3,
+     "I would be willing to adjust my view if presented with convincing evidence.", 1.0),
+    ("attitude_valid_concerns", "Opponents Have Valid Concerns", "attitude", 4,
+     "People who disagree with me may still have valid concerns.", 1.0),
+    ("attitude_common_ground", "Possible to Find Common Ground", "attitude", 5,
+     "I believe it is possible to find common ground between opposing views.", 1.0),
+
+    # B. TOPIC-SPECIFIC (10)
+    ("match_support_main_idea", "Support Main Idea", "matching", 1,
+     "I support the main idea behind this topic.", 2.0),
+    ("match_benefits_outweigh_risks", "Benefits Outweigh Risks", "matching", 2,
+     "I believe the benefits of this topic outweigh its risks.", 1.8),
+    ("match_take_action", "Would Take Action", "matching", 3,
+     "I would personally take action to support this issue.", 1.5),
+    ("match_positive_impact", "Positive Impact", "matching", 4,
+     "This issue has an overall positive impact on society.", 1.9),
+    ("match_deserves_attention", "Deserves Attention", "matching", 5,
+     "This issue deserves more public attention.", 1.3),
+    ("match_trust_experts", "Trust Experts", "matching", 6,
+     "I trust the experts or authorities on this topic.", 1.4),
+    ("match_emotional_connection", "Emotional Connection", "matching", 7,
+     "I feel emotionally connected to this issue.", 1.2),
+    ("match_opposing_misunderstanding", "Opposition = Misunderstanding", "matching", 8,
+     "I think opposing views are often based on misunderstanding.", 1.1),
+    ("match_should_be_priority", "Should Be Priority", "matching", 9,
+     "Addressing this issue should be a priority.", 1.7),
+    ("match_aligns_values", "Aligns with Values", "matching", 10,
+     "This topic aligns with my personal values.", 1.6),
+)
+
+# (question_type, question_number) -> (name, display_name, description, default_weight)
+DIMENSION_BY_KEY = {
+    (qtype, qnum): (name, display_name, desc, weight)
+    for name, display_name, qtype, qnum, desc, weight in _DIMENSIONS
+}
+
+# (question_type, question_number) -> OpinionDimension.id. The dimensions are
+# static after initialization, so this is filled once per process by
+# initialize_opinion_dimensions() and saving answers needs no lookup query.
+_DIM_ID_BY_KEY = {}
+
+
+def _dimension_ids():
+    from .models import OpinionDimension
+
+    if not _DIM_ID_BY_KEY:
+        rows = OpinionDimension.query.with_entities(
+            OpinionDimension.question_type,
+            OpinionDimension.question_number,
+            OpinionDimension.id
+        ).all()
+        _DIM_ID_BY_KEY.update({(qtype, qnum): dim_id for qtype, qnum, dim_id in rows})
+    return _DIM_ID_BY_KEY
+
+
+# Set once the dimensions are known to exist, so further app instances in
+# this process skip the DB check.
+_DIMS_INITIALIZED = False
+
+
 def initialize_opinion_dimensions():
     """
     Initialize the 15 opinion dimensions if they are not already present.
     """
+    global _DIMS_INITIALIZED
+    if _DIMS_INITIALIZED:
+        return
+
     from .models import OpinionDimension
 
-    existing = OpinionDimension.query.count()
-    if existing >= 15:
-        # already initialized (or more)
+    # Existence probe instead of COUNT(*): any row means already initialized
+    try:
+        present = db.session.query(OpinionDimension.id).limit(1).first() is not None
+    except (exc.ProgrammingError, exc.OperationalError):
+        db.session.rollback()
+        if inspect(db.engine).has_table(OpinionDimension.__tablename__):
+            raise
+        # Fresh database: `flask db upgrade` imports the app before it has
+        # created any tables, so leave seeding to the next start.
+        log.warning("Table %s does not exist yet; run `flask db upgrade`",
+                    OpinionDimension.__tablename__)
         return
 
-    dimensions = [
-        # A. GENERAL ATTITUDE (5)
-        ("attitude_open_to_differ", "Open to Different Opinions", "attitude", 1,
-         "I am open to hearing opinions on this topic that differ from my own.", 1.0),
-        ("attitude_see_both_sides", "See Both Positive and Negative", "attitude", 2,
-         "I can see both positive and negative aspects of this issue.", 1.0),
-        ("attitude_willing_adjust", "Willing to Adjust View", "attitude", 3,
-         "I would be willing to adjust my view if presented with convincing evidence.", 1.0),
-        ("attitude_valid_concerns", "Opponents Have Valid Concerns", "attitude", 4,
-         "People who disagree with me may still have valid concerns.", 1.0),
-        ("attitude_common_ground", "Possible to Find Common Ground", "attitude", 5,
-         "I believe it is possible to find common ground between opposing views.", 1.0),
-
-        # B. TOPIC-SPECIFIC (10)
-        ("match_support_main_idea", "Support Main Idea", "matching", 1,
-         "I support the main idea behind this topic.", 2.0),
-        ("match_benefits_outweigh_risks", "Benefits Outweigh Risks", "matching", 2,
-         "I believe the benefits of this topic outweigh its risks.", 1.8),
-        ("match_take_action", "Would Take Action", "matching", 3,
-         "I would personally take action to support this issue.", 1.5),
-        ("match_positive_impact", "Positive Impact", "matching", 4,
-         "This issue has an overall positive impact on society.", 1.9),
-        ("match_deserves_attention", "Deserves Attention", "matching", 5,
-         "This issue deserves more public attention.", 1.3),
-        ("match_trust_experts", "Trust Experts", "matching", 6,
-         "I trust the experts or authorities on this topic.", 1.4),
-        ("match_emotional_connection", "Emotional Connection", "matching", 7,
-         "I feel emotionally connected to this issue.", 1.2),
-        ("match_opposing_misunderstanding", "Opposition = Misunderstanding", "matching", 8,
-         "I think opposing views are often based on misunderstanding.", 1.1),
-        ("match_should_be_priority", "Should Be Priority", "matching", 9,
-         "Addressing this issue should be a priority.", 1.7),
-        ("match_aligns_values", "Aligns with Values", "matching", 10,
-         "This topic aligns with my personal values.", 1.6),
-    ]
-
-    for name, display_name, qtype, qnum, desc, weight in dimensions:
-        existing_dim = OpinionDimension.query.filter_by(name=name).first()
-        if existing_dim:
-            continue
+    if present:
+        _dimension_ids()
+        _DIMS_INITIALIZED = True
+        return
 
-        dim = OpinionDimension(
-            name=name,
-            display_name=display_name,
-            question_type=qtype,
-            question_number=qnum,
-            description=desc,
-            default_weight=weight,
-            is_active=True
-        )
-        db.session.add(dim)
+    rows = [
+        {
+            "name": name,
+            "display_name": display_name,
+            "question_type": qtype,
+            "question_number": qnum,
+            "description": desc,
+            "default_weight": weight,
+            "is_active": True,
+        }
+        for name, display_name, qtype, qnum, desc, weight in _DIMENSIONS
+    ]
 
+    # Single INSERT ... ON CONFLICT (name) DO NOTHING: one round-trip, and
+    # safe when several workers boot at the same time.
+    stmt = insert(OpinionDimension).values(rows).on_conflict_do_nothing(index_elements=["name"])
+    db.session.execute(stmt)
     db.session.commit()
-    print("✓ Opinion dimensions initialized.")
+    _dimension_ids()
+    _DIMS_INITIALIZED = True
+    log.info("Opinion dimensions initialized")
 
 
 # ========================================================
 # QUESTIONNAIRE LOGIC (STAYS HERE, USED BY views.py)
 # ========================================================
+def _compute_openness(scores):
+    """Openness score: mean of the attitude answers (-2 to +2 scale)."""
+    return statistics.fmean(scores)
+
+
+def update_openness_scores(attitude_scores_by_user):
+    """
+    Batch path (e.g. imports): set openness_score / is_extremist for many
+    users with one bulk UPDATE. Maps user id -> list of attitude scores.
+    Returns the number of users updated. Does not commit; the caller commits.
+    Every id must exist: an unknown user id raises StaleDataError.
+    """
+    from .models import User
+
+    rows = []
+    for user_id, scores in attitude_scores_by_user.items():
+        if not scores:
+            continue
+        openness_score = _compute_openness(scores)
+        rows.append({
+            "id": user_id,
+            "openness_score": openness_score,
+            "is_extremist": openness_score < 0.0,
+        })
+
+    if rows:
+        db.session.execute(update(User), rows)
+    return len(rows)
+
+
 def save_questionnaire_responses(user_id, form_data):
     """
     Save responses from the 15-question questionnaire using -2 to +2 scale.
+    All answers are written with a single INSERT ... ON CONFLICT DO UPDATE.
+    Does not commit; the calling view commits once for the whole request.
     """
-    from .models import User, UserOpinion, OpinionDimension
+    from .models import User, UserOpinion
 
     user = User.query.get(user_id)
     if not user:
         return None
 
+    dim_ids = _dimension_ids()
+    now = datetime.now(timezone.utc)
+    rows = []
     attitude_scores = []
 
     # Process attitude questions (1-5)
@@ -193,29 +326,10 @@ def save_questionnaire_responses(user_id, form_data):
         field_name = f'attitude{i}'
         if field_name in form_data:
             score = float(form_data[field_name])
-
-            dimension = OpinionDimension.query.filter_by(
-                question_type='attitude',
-                question_number=i
-            ).first()
-
-            if dimension:
-                opinion = UserOpinion.query.filter_by(
-                    user_id=user_id,
-                    dimension_id=dimension.id
-                ).first()
-
-                if opinion:
-                    opinion.score = score
-                    opinion.updated_at = datetime.utcnow()
-                else:
-                    opinion = UserOpinion(
-                        user_id=user_id,
-                        dimension_id=dimension.id,
-                        score=score
-                    )
-                    db.session.add(opinion)
-
+            dimension_id = dim_ids.get(('attitude', i))
+            if dimension_id is not None:
+                rows.append({"user_id": user_id, "dimension_id": dimension_id,
+                             "score": score, "updated_at": now})
                 attitude_scores.append(score)
 
     # Process matching questions (1-10)
@@ -223,37 +337,25 @@ def save_questionnaire_responses(user_id, form_data):
         field_name = f'match{i}'
         if field_name in form_data:
             score = float(form_data[field_name])
-
-            dimension = OpinionDimension.query.filter_by(
-                question_type='matching',
-                question_number=i
-            ).first()
-
-            if dimension:
-                opinion = UserOpinion.query.filter_by(
-                    user_id=user_id,
-                    dimension_id=dimension.id
-                ).first()
-
-                if opinion:
-                    opinion.score = score
-                    opinion.updated_at = datetime.utcnow()
-                else:
-                    opinion = UserOpinion(
-                        user_id=user_id,
-                        dimension_id=dimension.id,
-                        score=score
-                    )
-                    db.session.add(opinion)
+            dimension_id = dim_ids.get(('matching', i))
+            if dimension_id is not None:
+                rows.append({"user_id": user_id, "dimension_id": dimension_id,
+                             "score": score, "updated_at": now})
+
+    if rows:
+        stmt = insert(UserOpinion).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "dimension_id"],
+            set_={"score": stmt.excluded.score, "updated_at": stmt.excluded.updated_at}
+        )
+        db.session.execute(stmt)
 
     # Calculate openness score (average of 5 attitude questions)
     if attitude_scores:
-        openness_score = sum(attitude_scores) / len(attitude_scores)
+        openness_score = _compute_openness(attitude_scores)
         user.openness_score = openness_score
         user.is_extremist = openness_score < 0.0  # Threshold: below neutral
 
-    db.session.commit()
-
     return {
         'openness_score': user.openness_score,
         'is_extremist': user.is_extremist,
@@ -261,54 +363,78 @@ def save_questionnaire_responses(user_id, form_data):
     }
 
 
+# Band lower bounds and their labels for get_openness_category
+_OPENNESS_THRESHOLDS = (-0.5, 0.0, 0.5, 1.5)
+_OPENNESS_LABELS = (
+    "Very Closed / Extremist",
+    "Somewhat Closed",
+    "Moderately Open",
+    "Open-Minded",
+    "Very Open-Minded",
+)
+
+
 def get_openness_category(openness_score):
     """Categorize user's openness level (-2 to +2 scale)."""
     if openness_score is None:
         return None
-    if openness_score >= 1.5:
-        return "Very Open-Minded"
-    elif openness_score >= 0.5:
-        return "Open-Minded"
-    elif openness_score >= 0.0:
-        return "Moderately Open"
-    elif openness_score >= -0.5:
-        return "Somewhat Closed"
-    else:
-        return "Very Closed / Extremist"
+    return _OPENNESS_LABELS[bisect.bisect_right(_OPENNESS_THRESHOLDS, openness_score)]
 
 
 # ========================================================
 # MATCHING SCHEDULER (NO EMAILS)
 # ========================================================
-class MatchingScheduler:
-    def __init__(self, app):
-        self.app = app
-        self.running = False
-        self.thread = None
-
-    def start(self):
-        if not self.running:
-            self.running = True
-            self.thread = Thread(target=self._run_scheduler, daemon=True)
-            self.thread.start()
-            print("✓ Matching scheduler started (no emails).")
-
-    def _run_scheduler(self):
-        from .matching_service import MatchingService
-
-        while self.running:
-            try:
-                with self.app.app_context():
-                    # Run batch matching
-                    stats = MatchingService.run_batch_matching()
+# Postgres advisory lock key: only one process runs a matching pass at a time
+MATCHING_LOCK_KEY = 734215
+
+SCHEDULER_JOB_DEFAULTS = {"coalesce": True, "max_instances": 1}
+
+
+def run_matching(app):
+    """One scheduled pass: batch matching plus expiry of old matches."""
+    from .matching_service import MatchingService
+
+    batch_error = None
+    try:
+        with app.app_context():
+            with db.engine.connect() as lock_conn:
+                got_lock = lock_conn.execute(
+                    text("SELECT pg_try_advisory_lock(:key)"), {"key": MATCHING_LOCK_KEY}
+                ).scalar()
+                if not got_lock:
+                    log.info("Matching pass already running elsewhere, skipping")
+                    return
+
+                try:
+                    # Batch matching and expiry are separate transactions, so
+                    # a failed matching pass doesn't hold up expiry.
+                    try:
+                        MatchingService.run_batch_matching()
+                    except Exception as e:
+                        db.session.rollback()
+                        log.exception("Batch matching failed")
+                        batch_error = e
+
                     expired = MatchingService.expire_old_matches()
                     if expired > 0:
-                        print(f"✓ Expired {expired} old matches")
-            except Exception as e:
-                print(f"✗ Scheduler error: {e}")
+                        log.info("Expired %d old matches", expired)
+                finally:
+                    lock_conn.execute(
+                        text("SELECT pg_advisory_unlock(:key)"), {"key": MATCHING_LOCK_KEY}
+                    )
+    except Exception:
+        log.exception("Scheduler error")
+        if app.debug:
+            raise
+
+    # Already logged above; in debug it still surfaces, after expiry has run
+    if batch_error is not None and app.debug:
+        raise batch_error
+
 
-            # Run every hour
-            time.sleep(3600)
+def _add_matching_job(sched, app):
+    sched.add_job(run_matching, "interval", hours=1, args=[app],
+                  next_run_time=datetime.now())
 
 
 # Global scheduler instance
@@ -316,10 +442,31 @@ scheduler = None
 
 
 def init_scheduler(app):
-    """Initialize and start the matching scheduler."""
+    """
+    Initialize and start the in-process matching scheduler (runs every hour).
+
+    Only starts when ENABLE_SCHEDULER=1, which operators must set on exactly
+    one process; every gunicorn worker calls create_app(). The preferred
+    setup is a separate `flask run-scheduler` process instead.
+    """
     global scheduler
+    if os.getenv("ENABLE_SCHEDULER") != "1":
+        return None
     if scheduler is None:
-        scheduler = MatchingScheduler(app)
+        scheduler = BackgroundScheduler(job_defaults=SCHEDULER_JOB_DEFAULTS)
+        _add_matching_job(scheduler, app)
         scheduler.start()
+        atexit.register(scheduler.shutdown)
+        log.info("Matching scheduler started (no emails)")
     return scheduler
 
+
+def run_scheduler_blocking(app):
+    """Run the hourly matching job in the foreground (dedicated process)."""
+    blocking = BlockingScheduler(job_defaults=SCHEDULER_JOB_DEFAULTS)
+    _add_matching_job(blocking, app)
+    log.info("Matching scheduler running in foreground (no emails)")
+    try:
+        blocking.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
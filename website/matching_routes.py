@@ -4,9 +4,9 @@ Flask routes for matching system
 
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
-from datetime import datetime
+from datetime import datetime, timezone
 from .models import db, User, UserOpinion, OpinionDimension, Match
-from .matching_service import MatchingService
+from .matching_service import MatchingService, current_user_opinions
 
 matching_bp = Blueprint('matching', __name__, url_prefix='/api/matching')
 
@@ -15,7 +15,7 @@ matching_bp = Blueprint('matching', __name__, url_prefix='/api/matching')
 @login_required
 def get_user_opinions():
     """Get current user's opinions"""
-    opinions = UserOpinion.query.filter_by(user_id=current_user.id).all()
+    opinions = current_user_opinions()
     
     return jsonify({
         'opinions': [{
@@ -56,7 +56,7 @@ def update_opinions():
             
             if user_opinion:
                 user_opinion.score = score
-                user_opinion.updated_at = datetime.utcnow()
+                user_opinion.updated_at = datetime.now(timezone.utc)
             else:
                 user_opinion = UserOpinion(
                     user_id=current_user.id,
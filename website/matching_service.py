@@ -1,9 +1,27 @@
-from flask import render_template
+from flask import render_template, g
+from flask_login import current_user
+from sqlalchemy.orm import joinedload
 
 from datetime import datetime, timedelta, time, date
 
 from .models import UserOpinion, OpinionDimension, User, Match, db
 
+
+def current_user_opinions():
+    """
+    Return the current user's opinions (with their dimensions joined in),
+    memoized on flask.g so repeated calls within one request hit the DB once.
+    """
+    if "user_opinions" not in g:
+        g.user_opinions = (
+            UserOpinion.query
+            .filter_by(user_id=current_user.id)
+            .options(joinedload(UserOpinion.dimension))
+            .all()
+        )
+    return g.user_opinions
+
+
 def time_overlap(u1, u2):
     """
     Return a common time slot string if any overlap, else None.
@@ -198,7 +216,8 @@ class MatchingService:
         )
 
         db.session.add(match)
-        db.session.commit()
+        # Flush only; the caller owns the transaction (see run_batch_matching)
+        db.session.flush()
         print(
             f"[MATCH] Match row created: {match.id} "
             f"({user_a.id} <-> {user_b.id}) topic={match.topic}"
@@ -213,6 +232,7 @@ class MatchingService:
         """
         Run a batch matching pass over all eligible users.
         Uses the same openness-based logic as find_best_match_for_user.
+        All matches of the pass are committed together at the end.
         Returns a small stats dict.
         """
         stats = {
@@ -306,9 +326,11 @@ class MatchingService:
                 # This should almost never trigger now, but keep it as extra safety
                 print(f"[BATCH MATCH] Unexpected error while preparing match emails: {mail_exc}")
 
-            db.session.commit()
             stats["matches_created"] += 1
 
+        # One transaction for the whole pass instead of a commit per match
+        db.session.commit()
+
         stats["topics_processed"] = len(topics)
         print(
             f"[BATCH MATCH] users={stats['users_processed']}, "
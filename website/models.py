@@ -1,7 +1,11 @@
 from . import db
 from flask_login import UserMixin
 from sqlalchemy.sql import func
-from datetime import datetime  # ADD THIS IMPORT
+from datetime import datetime, timezone  # ADD THIS IMPORT
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
 
 
 class User(db.Model, UserMixin):
@@ -104,6 +108,9 @@ class User(db.Model, UserMixin):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # NEW
     
     # NEW RELATIONSHIPS - Add these at the end
+    # Matched partner (partner_id has no FK constraint, so the join is explicit)
+    partner = db.relationship('User', primaryjoin='foreign(User.partner_id) == remote(User.id)',
+                              uselist=False, viewonly=True)
     opinions = db.relationship('UserOpinion', back_populates='user', cascade='all, delete-orphan')
     matches_initiated = db.relationship('Match', foreign_keys='Match.user_a_id', back_populates='user_a', cascade='all, delete-orphan')
     matches_received = db.relationship('Match', foreign_keys='Match.user_b_id', back_populates='user_b', cascade='all, delete-orphan')
@@ -135,6 +142,11 @@ class OpinionDimension(db.Model):
     # Relationships
     user_opinions = db.relationship('UserOpinion', back_populates='dimension', cascade='all, delete-orphan')
 
+    # Constraints
+    __table_args__ = (
+        db.Index('ix_opiniondim_type_num', 'question_type', 'question_number', unique=True),
+    )
+
 
 class UserOpinion(db.Model):
     """
@@ -154,7 +166,7 @@ class UserOpinion(db.Model):
     custom_weight = db.Column(db.Float, nullable=True)
     
     # Metadata
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime(timezone=True), default=_utcnow, onupdate=_utcnow)
     
     # Relationships
     user = db.relationship('User', back_populates='opinions')
@@ -1,6 +1,12 @@
+import bisect
+import functools
+import logging
+
 from flask import Blueprint, render_template, request, flash, redirect, url_for, session
 from flask_login import login_required, current_user
 from datetime import datetime, timedelta, time, date
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import SQLAlchemyError
 
 from . import db
 from .models import User, SuggestedTopic
@@ -8,10 +14,37 @@ from .matching_service import MatchingService
 from . import save_questionnaire_responses, get_openness_category
 
 views = Blueprint('views', __name__)
+log = logging.getLogger(__name__)
+
+# Set to True to disable the home page's start button
+BUTTON_DISABLED = False
+
 
+def _update_current_user(values):
+    """Write several columns of the current user with a single UPDATE."""
+    if values:
+        db.session.execute(update(User).where(User.id == current_user.id).values(**values))
 
-def is_button_disabled():
-    return False
+
+def _common_slot(user, partner):
+    """Earliest time slot both users picked, or None."""
+    best = None
+    partner_slots = (partner.time_slot_1, partner.time_slot_2, partner.time_slot_3)
+    for slot in (user.time_slot_1, user.time_slot_2, user.time_slot_3):
+        if slot and slot in partner_slots and (best is None or slot < best):
+            best = slot
+    return best
+
+
+def _partner_slot_label(user, partner):
+    """Human-readable label of the earliest common slot, or None."""
+    slot = _common_slot(user, partner)
+    if not slot:
+        return None
+    try:
+        return datetime.fromisoformat(slot).strftime('%A, %d %B %Y, %H:%M')
+    except ValueError:
+        return slot
 
 
 @views.route('/index', methods=['GET', 'POST'])
@@ -20,20 +53,9 @@ def index():
     partner = None
     slot_label = None
 
-    if current_user.is_authenticated and current_user.haspartner:
-        partner = User.query.get(current_user.partner_id)
-
-        if partner:
-            my_slots = {current_user.time_slot_1, current_user.time_slot_2, current_user.time_slot_3}
-            partner_slots = {partner.time_slot_1, partner.time_slot_2, partner.time_slot_3}
-            common = [s for s in my_slots.intersection(partner_slots) if s]
-
-            if common:
-                try:
-                    dt = datetime.fromisoformat(sorted(common)[0])
-                    slot_label = dt.strftime('%A, %d %B %Y, %H:%M')
-                except:
-                    slot_label = sorted(common)[0]
+    if current_user.is_authenticated and current_user.haspartner and current_user.partner:
+        partner = current_user.partner
+        slot_label = _partner_slot_label(current_user, partner)
 
     return render_template('index.html',
                            user=current_user,
@@ -54,27 +76,16 @@ def home():
     partner = None
     slot_label = None
 
-    if current_user.demo and current_user.haspartner:
-        partner = User.query.get(current_user.partner_id)
-
-        if partner:
-            my_slots = {current_user.time_slot_1, current_user.time_slot_2, current_user.time_slot_3}
-            partner_slots = {partner.time_slot_1, partner.time_slot_2, partner.time_slot_3}
-            common = [s for s in my_slots.intersection(partner_slots) if s]
-
-            if common:
-                try:
-                    dt = datetime.fromisoformat(common[0])
-                    slot_label = dt.strftime('%A, %d %B %Y, %H:%M')
-                except:
-                    slot_label = common[0]
+    if current_user.demo and current_user.haspartner and current_user.partner:
+        partner = current_user.partner
+        slot_label = _partner_slot_label(current_user, partner)
 
     return render_template(
         'home.html',
         user=current_user,
         partner=partner,
         slot_label=slot_label,
-        button_disabled=is_button_disabled()
+        button_disabled=BUTTON_DISABLED
     )
 
 
@@ -82,8 +93,8 @@ def home():
 @login_required
 def new_questionnaire_part1():
     if request.method == 'POST':
-        for i in range(1, 6):
-            setattr(current_user, f'attitude{i}', request.form.get(f'attitude{i}'))
+        values = {f'attitude{i}': request.form.get(f'attitude{i}') for i in range(1, 6)}
+        _update_current_user(values)
 
         db.session.commit()   # commit once
         return redirect(url_for('views.new_questionnaire'))
@@ -91,89 +102,98 @@ def new_questionnaire_part1():
     return render_template('new_questionnaire_part1.html', user=current_user)
 
 
+_QUESTIONNAIRE_FIELDS = (
+    tuple(f'attitude{i}' for i in range(1, 6)) +
+    tuple(f'match{i}' for i in range(1, 11))
+)
+
+
 @views.route('/new_questionnaire', methods=['GET', 'POST'])
 @login_required
 def new_questionnaire():
     if request.method == 'POST':
         try:
-            combined = {}
-
-            for i in range(1, 6):
-                key = f'attitude{i}'
-                if key in session:
-                    combined[key] = session[key]
-
-            combined.update(request.form.to_dict())
-
+            # Only the 15 known answers are read, straight from the form
+            # (falling back to the session), instead of copying the whole form.
+            answers = {}
+            for key in _QUESTIONNAIRE_FIELDS:
+                val = request.form.get(key) or session.get(key)
+                if val not in ('', None):
+                    answers[key] = val
+
+            values = {}
             for i in range(1, 11):
                 key = f'match{i}'
-                if key in combined and combined[key] not in ('', None):
-                    setattr(current_user, key, int(combined[key]))
-
-            db.session.commit()
+                if key in answers:
+                    values[key] = int(answers[key])
 
-            result = save_questionnaire_responses(current_user.id, combined)
+            result = save_questionnaire_responses(current_user.id, answers)
             if not result:
                 flash("Error saving data.", "error")
                 return render_template('new_questionnaire_part2.html', user=current_user)
 
+            if not result.get('is_extremist'):
+                values['demo'] = True
+
+            # Answers, opinions and the demo flag go out in one transaction
+            _update_current_user(values)
+            db.session.commit()
+
             if result.get('is_extremist'):
                 flash("You do not meet the eligibility criteria.", "error")
                 return redirect(url_for('views.index'))
 
-            current_user.demo = True
-            db.session.commit()
-
             return redirect(url_for('views.demographics'))
 
-        except Exception as e:
+        except (SQLAlchemyError, ValueError):
             db.session.rollback()
             flash("Error processing questionnaire.", "error")
 
     return render_template('new_questionnaire_part2.html', user=current_user)
 
 
-from datetime import datetime, timedelta, time, date
-
-def generate_time_slots():
-    now = datetime.now()
-    today = date.today()
-    year = today.year
-
+@functools.lru_cache(maxsize=2)
+def _slot_grid(year):
+    """
+    All dialogue slots of the year, sorted: (datetimes, slot dicts).
+    Built once per year; requests only bisect off the past ones.
+    """
     # Fixed window: December 1–10 of this year
     start_day = date(year, 12, 1)
     end_day = date(year, 12, 10)
 
-    # If today is after Dec 10, you can optionally early-return:
-    if today > end_day:
-        return []
-
     times = [12, 15, 17]  # 12:00, 15:00 (3pm), 17:00 (5pm)
+    datetimes = []
     slots = []
 
     day = start_day
     while day <= end_day:
         for hour in times:
             dt = datetime.combine(day, time(hour))
-
-            # Only keep future slots (hide past times & past days)
-            if dt >= now:
-                prefix = day.strftime('%a %d.%m.')
-                slots.append({
-                    "value": dt.isoformat(),
-                    "label": f"{prefix} {dt.strftime('%H:%M')}"
-                })
+            prefix = day.strftime('%a %d.%m.')
+            datetimes.append(dt)
+            slots.append({
+                "value": dt.isoformat(),
+                "label": f"{prefix} {dt.strftime('%H:%M')}"
+            })
 
         day += timedelta(days=1)
 
-    return slots
+    return datetimes, slots
+
+
+def generate_time_slots():
+    now = datetime.now()
+    datetimes, slots = _slot_grid(now.year)
+
+    # Only keep future slots (hide past times & past days)
+    return slots[bisect.bisect_left(datetimes, now):]
 
 
 @views.route('/demographics', methods=['GET', 'POST'])
 @login_required
 def demographics():
-    slots = generate_time_slots()
-
+    # Slots are only needed when the form is rendered, not on a successful POST
     if request.method == 'POST':
         try:
             gender = request.form.get('gender')
@@ -184,54 +204,58 @@ def demographics():
 
             if not all([gender, age, education, job, slot1]):
                 flash("Please complete all required fields.", "error")
-                return render_template('Questionnaire1/demographics.html', user=current_user, slots=slots)
-
-            current_user.gender = gender
-            current_user.age = age
-            current_user.education = education
-            current_user.job = job
-            current_user.time_slot_1 = slot1
-            current_user.time_slot_2 = request.form.get('availability2') or None
-            current_user.time_slot_3 = request.form.get('availability3') or None
-
+                return render_template('Questionnaire1/demographics.html', user=current_user,
+                                       slots=generate_time_slots())
+
+            _update_current_user({
+                'gender': gender,
+                'age': age,
+                'education': education,
+                'job': job,
+                'time_slot_1': slot1,
+                'time_slot_2': request.form.get('availability2') or None,
+                'time_slot_3': request.form.get('availability3') or None,
+            })
+
+            # Demographics and the matching result are committed together;
+            # a matching failure only rolls back its own savepoint
+            find_matches_for_user(current_user._get_current_object())
             db.session.commit()
 
-            find_matches_for_user(current_user.id)
-
             flash("Data saved. Check the platform regularly to see if you have been matched.", "success")
             return redirect(url_for('views.endofq1'))
 
-        except Exception as e:
+        except SQLAlchemyError:
             db.session.rollback()
             flash("Error saving data.", "error")
 
-    return render_template('Questionnaire1/demographics.html', user=current_user, slots=slots)
+    return render_template('Questionnaire1/demographics.html', user=current_user,
+                           slots=generate_time_slots())
 
 
-def find_matches_for_user(user_id):
+def find_matches_for_user(user):
+    # Runs in its own savepoint, so a failed match only rolls back the
+    # matching writes and not the caller's pending demographics UPDATE
     try:
-        user = User.query.get(user_id)
-        if not user:
-            return
-
-        result = MatchingService.find_best_match_for_user(user)
-        if not result:
-            return
-
-        matched_user, score, decision, common_slot = result
+        with db.session.begin_nested():
+            result = MatchingService.find_best_match_for_user(user)
+            if not result:
+                return
 
-        user.haspartner = True
-        matched_user.haspartner = True
-        user.partner_id = matched_user.id
-        matched_user.partner_id = user.id
+            matched_user, score, decision, common_slot = result
 
-        user.meeting_id = user.id
-        matched_user.meeting_id = user.id
+            user.haspartner = True
+            matched_user.haspartner = True
+            user.partner_id = matched_user.id
+            matched_user.partner_id = user.id
 
-        db.session.commit()
+            user.meeting_id = user.id
+            matched_user.meeting_id = user.id
 
-    except Exception as e:
-        print(f"[MATCH ERR] {e}")
+    except Exception:
+        # Deliberately broad: any matching bug is logged with its traceback
+        # and must not stop the demographics from being saved
+        log.exception("[MATCH ERR] matching failed for user %s", user.id)
 
 
 @views.route('/Questionnaire1/end')
@@ -253,18 +277,21 @@ def introduction():
 @login_required
 def waitpage():
     try:
-        partner = User.query.get(current_user.partner_id) if current_user.partner_id else None
+        partner = current_user.partner
+        # Read before the commit expires the partner (avoids a full-row reload)
+        partner_arrived = bool(partner and partner.hasarrived)
         current_user.hasarrived = True
         db.session.commit()
 
         if request.method == "POST":
-            if partner and partner.hasarrived:
+            if partner_arrived:
                 return "partner_arrived"
             return "no_partner_arrived"
 
         return render_template('Interaction/waitPage.html', user=current_user)
 
-    except Exception:
+    except SQLAlchemyError:
+        db.session.rollback()
         return render_template('Interaction/waitPage.html', user=current_user)
 
 
@@ -289,26 +316,28 @@ def future():
 
 
 # -------- Post-Match Questionnaire ----------
+# Post-discussion answers to the 10 topic questions, in question order
+_POST_MATCH_FIELDS = (
+    'post_match1_support', 'post_match2_benefits', 'post_match3_action',
+    'post_match4_impact', 'post_match5_attention', 'post_match6_trust',
+    'post_match7_econnected', 'post_match8_misunderstanding',
+    'post_match9_priority', 'post_match10_values'
+)
+_PM_FIELDS = _POST_MATCH_FIELDS + ('post_reflection',)
+
+
 @views.route('/Questionnaire2/post_match_questionnaire', methods=['GET', 'POST'])
 @login_required
 def post_match_questionnaire():
-    fields = [
-        'post_match1_support', 'post_match2_benefits', 'post_match3_action', 'post_match4_impact',
-        'post_match5_attention', 'post_match6_trust', 'post_match7_econnected',
-        'post_match8_misunderstanding', 'post_match9_priority', 'post_match10_values',
-        'post_reflection'
-    ]
-
     if request.method == 'POST':
+        form = request.form
         try:
-            for f in fields:
-                val = request.form.get(f)
-                setattr(current_user, f, val or None)
+            _update_current_user({f: form.get(f) or None for f in _PM_FIELDS})
 
             db.session.commit()
             return redirect(url_for('views.discussion_evaluation'))
 
-        except Exception as e:
+        except SQLAlchemyError:
             db.session.rollback()
             flash("Error saving answers.", "error")
 
@@ -316,23 +345,21 @@ def post_match_questionnaire():
 
 
 # -------- Discussion Evaluation ----------
+_DISC_EVAL_FIELDS = tuple(f'disc_evaluation{i}' for i in range(1, 11))
+
+
 @views.route('/Questionnaire2/discussion_evaluation', methods=['GET', 'POST'])
 @login_required
 def discussion_evaluation():
     if request.method == 'POST':
+        form = request.form
         try:
-            for attr in [
-                'disc_evaluation1', 'disc_evaluation2', 'disc_evaluation3',
-                'disc_evaluation4', 'disc_evaluation5', 'disc_evaluation6',
-                'disc_evaluation7', 'disc_evaluation8', 'disc_evaluation9',
-                'disc_evaluation10'
-            ]:
-                setattr(current_user, attr, request.form.get(attr) or None)
+            _update_current_user({f: form.get(f) or None for f in _DISC_EVAL_FIELDS})
 
             db.session.commit()
             return redirect(url_for('views.opinion_shift_analysis'))
 
-        except Exception:
+        except SQLAlchemyError:
             db.session.rollback()
             flash("Error processing evaluation.", "error")
 
@@ -340,6 +367,23 @@ def discussion_evaluation():
 
 
 # -------- Opinion Shift ----------
+# Pre-discussion answers, in the same order as _POST_MATCH_FIELDS
+_MATCH_FIELDS = tuple(f'match{i}' for i in range(1, 11))
+
+
+def _as_int(val):
+    return int(val) if val not in (None, '') else None
+
+
+def _loaded_values(user, fields):
+    """
+    Read column values straight from the instance dict, skipping the ORM
+    attribute descriptors; anything not loaded goes through getattr.
+    """
+    state = vars(user)
+    return [state[f] if f in state else getattr(user, f) for f in fields]
+
+
 @views.route('/opinion_shift_analysis')
 @login_required
 def opinion_shift_analysis():
@@ -357,23 +401,9 @@ def opinion_shift_analysis():
             "Aligns with personal values"
         ]
 
-        before = []
-        after = []
-
-        for i in range(1, 11):
-            val = getattr(current_user, f'match{i}')
-            before.append(int(val) if val not in (None, '') else None)
-
-        post_fields = [
-            'post_match1_support', 'post_match2_benefits', 'post_match3_action',
-            'post_match4_impact', 'post_match5_attention', 'post_match6_trust',
-            'post_match7_econnected', 'post_match8_misunderstanding',
-            'post_match9_priority', 'post_match10_values'
-        ]
-
-        for f in post_fields:
-            val = getattr(current_user, f)
-            after.append(int(val) if val not in (None, '') else None)
+        user = current_user._get_current_object()
+        before = [_as_int(val) for val in _loaded_values(user, _MATCH_FIELDS)]
+        after = [_as_int(val) for val in _loaded_values(user, _POST_MATCH_FIELDS)]
 
         shifts = [(a - b) if (a is not None and b is not None) else None for b, a in zip(before, after)]
 
@@ -386,7 +416,7 @@ def opinion_shift_analysis():
             shifts=shifts,
         )
 
-    except Exception as e:
+    except ValueError:
         return redirect(url_for('views.reward'))
 
 
@@ -394,7 +424,7 @@ def opinion_shift_analysis():
 @views.route('/Reward')
 @login_required
 def reward():
-    partner = User.query.get(current_user.partner_id) if current_user.partner_id else None
+    partner = current_user.partner
     return render_template('Questionnaire2/reward.html', user=current_user, partner=partner)
 
 
@@ -403,19 +433,12 @@ def reward():
 @login_required
 def check_user():
     from .models import OpinionDimension, UserOpinion
-    dims = OpinionDimension.query.count()
-    user_opinions = UserOpinion.query.filter_by(user_id=current_user.id).count()
-
-    return f"""
-    <h2>User Debug Info</h2>
-    <p>User ID: {current_user.id}</p>
-    <p>Email: {current_user.email}</p>
-    <p>Topic: {current_user.topic}</p>
-    <p>Demo: {current_user.demo}</p>
-    <p>Openness Score: {current_user.openness_score}</p>
-    <p>Is Extremist: {current_user.is_extremist}</p>
-    <hr>
-    <p>Total Opinion Dimensions: {dims}</p>
-    <p>User Opinions Recorded: {user_opinions}</p>
-    <a href="/">Go Home</a>
-    """
+
+    # Both counts in one round-trip
+    dims, user_opinions = db.session.execute(select(
+        select(func.count()).select_from(OpinionDimension).scalar_subquery(),
+        select(func.count()).select_from(UserOpinion)
+        .where(UserOpinion.user_id == current_user.id).scalar_subquery(),
+    )).one()
+
+    return render_template('check_user.html', user=current_user, dims=dims, user_opinions=user_opinions)